@@ -391,6 +391,11 @@ config = mlc.ConfigDict(
                     "pair_dropout": 0.25,
                     "blocks_per_ckpt": blocks_per_ckpt,
                     "clear_cache_between_blocks": True,
+                    "precision": "fp32",
+                    "checkpoint_policy": "full",
+                    "checkpoint_pair_updates": False,
+                    "fuse_msa_transition": False,
+                    "offload_activations": False,
                     "inf": 1e9,
                     "eps": eps,  # 1e-10,
                 },
@@ -412,6 +417,10 @@ config = mlc.ConfigDict(
                 "pair_dropout": 0.25,
                 "blocks_per_ckpt": blocks_per_ckpt,
                 "clear_cache_between_blocks": False,
+                "precision": "fp32",
+                "checkpoint_policy": "full",
+                "checkpoint_pair_updates": False,
+                "fuse_msa_transition": False,
                 "inf": 1e9,
                 "eps": eps,  # 1e-10,
             },    
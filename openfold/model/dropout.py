@@ -43,6 +43,15 @@ class Dropout(nn.Module):
         self.batch_dim = batch_dim
         self.dropout = nn.Dropout(self.r)
 
+    def _mask(self, x: torch.Tensor) -> torch.Tensor:
+        shape = list(x.shape)
+        if self.batch_dim is not None:
+            for bd in self.batch_dim:
+                shape[bd] = 1
+        mask = x.new_ones(shape)
+        mask = self.dropout(mask)
+        return mask
+
     def forward(self, x: torch.Tensor) -> torch.Tensor:
         """
         Args:
@@ -50,15 +59,34 @@ class Dropout(nn.Module):
                 Tensor to which dropout is applied. Can have any shape
                 compatible with self.batch_dim
         """
-        shape = list(x.shape)
-        if self.batch_dim is not None:
-            for bd in self.batch_dim:
-                shape[bd] = 1
-        mask = x.new_ones(shape)
-        mask = self.dropout(mask)
-        x *= mask
+        # Skips an all-ones multiplication over the whole input
+        if not self.training or self.r == 0.:
+            return x
+
+        x *= self._mask(x)
         return x
 
+    def residual_add(
+        self,
+        residual: torch.Tensor,
+        x: torch.Tensor,
+    ) -> torch.Tensor:
+        """
+        Computes residual + dropout(x) without writing the dropped-out
+        update to memory before the addition.
+
+        Args:
+            residual:
+                Tensor to which the update is added
+            x:
+                Update to which dropout is applied. Must have the same
+                shape as residual
+        """
+        if not self.training or self.r == 0.:
+            return residual + x
+
+        return torch.addcmul(residual, x, self._mask(x))
+
 
 class DropoutRowwise(Dropout):
     """
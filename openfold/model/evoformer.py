@@ -13,12 +13,17 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import importlib
+import logging
+import os
+from contextlib import nullcontext
 import torch
 import torch.nn as nn
-from typing import Tuple, Optional
+import torch.utils.checkpoint
+from typing import Callable, List, Tuple, Optional
 from functools import partial
 
-from openfold.model.primitives import Linear
+from openfold.model.primitives import Linear, Fp32LayerNorm
 from openfold.model.dropout import DropoutRowwise, DropoutColumnwise
 from openfold.model.msa import (
     MSARowAttentionWithPairBias,
@@ -35,8 +40,59 @@ from openfold.model.triangular_multiplicative_update import (
     TriangleMultiplicationOutgoing,
     TriangleMultiplicationIncoming,
 )
-from openfold.utils.checkpointing import checkpoint_blocks
-from openfold.utils.tensor_utils import chunk_layer
+from openfold.utils.checkpointing import (
+    checkpoint_blocks,
+    offload_saved_tensors,
+    CHECKPOINT_POLICIES,
+)
+
+triton_is_installed = importlib.util.find_spec("triton") is not None
+if(triton_is_installed):
+    from openfold.utils.kernel.transition_core import msa_transition_fused
+
+# The expandable_segments allocator option shipped in PyTorch 2.1, along
+# with the hook used to change allocator settings at runtime
+expandable_segments_are_supported = hasattr(
+    torch.cuda.memory, "_set_allocator_settings"
+)
+
+
+_EXPANDABLE_SEGMENTS_CONF = "expandable_segments:True,max_split_size_mb:512"
+_expandable_segments_enabled = False
+
+
+def _enable_expandable_segments() -> bool:
+    """
+    Turns on the CUDA caching allocator's expandable segments.
+
+    This changes the allocator settings for the whole process, so it is
+    logged the first time it happens.
+
+    Returns:
+        Whether expandable segments are in use. Explicit allocator settings
+        in PYTORCH_CUDA_ALLOC_CONF always take precedence.
+    """
+    global _expandable_segments_enabled
+    if(_expandable_segments_enabled):
+        return True
+
+    alloc_conf = os.environ.get("PYTORCH_CUDA_ALLOC_CONF", None)
+    if(alloc_conf is not None):
+        return "expandable_segments:True" in alloc_conf
+
+    if(torch.cuda.is_initialized()):
+        torch.cuda.memory._set_allocator_settings(_EXPANDABLE_SEGMENTS_CONF)
+    else:
+        os.environ["PYTORCH_CUDA_ALLOC_CONF"] = _EXPANDABLE_SEGMENTS_CONF
+
+    logging.warning(
+        "Setting the process-wide CUDA allocator configuration to "
+        f"\"{_EXPANDABLE_SEGMENTS_CONF}\". Set PYTORCH_CUDA_ALLOC_CONF "
+        "explicitly to override this"
+    )
+    _expandable_segments_enabled = True
+
+    return True
 
 
 class MSATransition(nn.Module):
@@ -46,7 +102,7 @@ class MSATransition(nn.Module):
     Implements Algorithm 9
     """
 
-    def __init__(self, c_m, n):
+    def __init__(self, c_m, n, use_triton=False):
         """
         Args:
             c_m:
@@ -54,36 +110,156 @@ class MSATransition(nn.Module):
             n:
                 Factor multiplied to c_m to obtain the hidden channel
                 dimension
+            use_triton:
+                Whether to run the transition as a single fused Triton
+                kernel during CUDA inference. The first fused output is
+                checked against the regular implementation, and the
+                module falls back to the latter permanently if the two
+                disagree or the kernel fails to compile
         """
         super(MSATransition, self).__init__()
 
         self.c_m = c_m
         self.n = n
+        self.use_triton = use_triton
+        self._triton_checked = False
 
-        self.layer_norm = nn.LayerNorm(self.c_m)
+        # Normalization statistics are always computed in fp32, even when
+        # the rest of the block runs in reduced precision
+        self.layer_norm = Fp32LayerNorm(self.c_m)
         self.linear_1 = Linear(self.c_m, self.n * self.c_m, init="relu")
         self.relu = nn.ReLU()
         self.linear_2 = Linear(self.n * self.c_m, self.c_m, init="final")
 
-    def _transition(self, m, mask):
+    def _transition_unmasked(self, m):
         m = self.linear_1(m)
         m = self.relu(m)
-        m = self.linear_2(m) * mask
+        m = self.linear_2(m)
         return m
 
-    @torch.jit.ignore
+    def _transition_masked(self, m, mask):
+        return self._transition_unmasked(m) * mask
+
+    def _transition_rows(self,
+        m_flat: torch.Tensor,
+        mask_flat: Optional[torch.Tensor],
+        start: int,
+        chunk_size: int,
+    ) -> torch.Tensor:
+        m_chunk = m_flat[start:start + chunk_size]
+        if mask_flat is not None:
+            return self._transition_masked(
+                m_chunk, mask_flat[start:start + chunk_size]
+            )
+
+        return self._transition_unmasked(m_chunk)
+
     def _chunk(self,
         m: torch.Tensor,
-        mask: torch.Tensor,
+        mask: Optional[torch.Tensor],
         chunk_size: int,
     ) -> torch.Tensor:
-         return chunk_layer(
-             self._transition,
-             {"m": m, "mask": mask},
-             chunk_size=chunk_size,
-             no_batch_dims=len(m.shape[:-2]),
-         )
+        # The transition acts on each row independently, so the batch
+        # dimensions can simply be flattened and sliced. Unlike chunk_layer,
+        # this is scriptable.
+        # [B, N_res, C_m]
+        m_flat = m.reshape([-1, m.shape[-2], m.shape[-1]])
+
+        mask_flat: Optional[torch.Tensor] = None
+        if mask is not None:
+            # [B, N_res, 1]
+            mask_flat = mask.expand_as(m[..., :1]).reshape(
+                [-1, m.shape[-2], 1]
+            )
+
+        # The first chunk determines the output dtype, which may differ from
+        # the input's under autocast. The remaining chunks are written into
+        # a single preallocated output.
+        first = self._transition_rows(m_flat, mask_flat, 0, chunk_size)
+        out = torch.empty(
+            [m_flat.shape[0], m_flat.shape[1], first.shape[-1]],
+            dtype=first.dtype,
+            device=first.device,
+        )
+        out[0:chunk_size] = first
+        del first
+
+        for i in range(chunk_size, m_flat.shape[0], chunk_size):
+            out[i:i + chunk_size] = self._transition_rows(
+                m_flat, mask_flat, i, chunk_size
+            )
+
+        return out.reshape(m.shape)
+
+    @torch.jit.ignore
+    def _can_fuse(self, m: torch.Tensor) -> bool:
+        # The fused kernel only implements the forward pass, and can't
+        # consume quantized weights
+        return (
+            self.use_triton and
+            triton_is_installed and
+            isinstance(self.linear_1, nn.Linear) and
+            isinstance(self.linear_2, nn.Linear) and
+            m.is_cuda and
+            not torch.is_grad_enabled()
+        )
+
+    @torch.jit.ignore
+    def _fused(self,
+        m: torch.Tensor,
+        mask: Optional[torch.Tensor],
+    ) -> Optional[torch.Tensor]:
+        try:
+            out = msa_transition_fused(
+                m,
+                mask,
+                layer_norm=self.layer_norm,
+                linear_1=self.linear_1,
+                linear_2=self.linear_2,
+            )
+        except Exception as e:
+            # e.g. the kernel doesn't compile or fit on this device
+            logging.warning(
+                f"Fused MSA transition failed ({e}). Falling back to the "
+                "regular implementation."
+            )
+            self.use_triton = False
+            return None
+
+        if(not self._triton_checked):
+            # tl.dot may use TF32 for fp32 inputs, hence the tolerances
+            ref = self._transition(m, mask, None)
+            tol = 1e-2 if m.dtype == torch.float32 else 5e-2
+            if(not torch.allclose(out, ref, rtol=tol, atol=tol)):
+                logging.warning(
+                    "Fused MSA transition disagrees with the regular "
+                    "implementation. Falling back to the latter."
+                )
+                self.use_triton = False
+                return ref
+
+            self._triton_checked = True
+
+        return out
+
+    def _transition(self,
+        m: torch.Tensor,
+        mask: Optional[torch.Tensor],
+        chunk_size: Optional[int],
+    ) -> torch.Tensor:
+        if mask is not None:
+            mask = mask.unsqueeze(-1)
 
+        m = self.layer_norm(m)
+
+        if chunk_size is not None:
+            m = self._chunk(m, mask, chunk_size)
+        elif mask is not None:
+            m = self._transition_masked(m, mask)
+        else:
+            m = self._transition_unmasked(m)
+
+        return m
 
     def forward(
         self,
@@ -102,19 +278,17 @@ class MSATransition(nn.Module):
                 [*, N_seq, N_res, C_m] MSA activation update
         """
         # DISCREPANCY: DeepMind forgets to apply the MSA mask here.
-        if mask is None:
-            mask = m.new_ones(m.shape[:-1])
+        # A missing mask is equivalent to a mask of ones, so the
+        # multiplication is skipped entirely in that case.
 
-        mask = mask.unsqueeze(-1)
+        # Fuses the LayerNorm, both linear layers, the ReLU, and the masking
+        # into a single kernel that never writes the hidden activation out
+        if chunk_size is None and self._can_fuse(m):
+            fused = self._fused(m, mask)
+            if fused is not None:
+                return fused
 
-        m = self.layer_norm(m)
-
-        if chunk_size is not None:
-            m = self._chunk(m, mask, chunk_size)
-        else:
-            m = self._transition(m, mask)
-
-        return m
+        return self._transition(m, mask, chunk_size)
 
 
 class EvoformerBlock(nn.Module):
@@ -133,10 +307,17 @@ class EvoformerBlock(nn.Module):
         pair_dropout: float,
         inf: float,
         eps: float,
+        use_flash: bool = True,
+        overlap_streams: bool = False,
+        checkpoint_pair_updates: bool = False,
+        fuse_msa_transition: bool = False,
         _is_extra_msa_stack: bool = False,
     ):
         super(EvoformerBlock, self).__init__()
 
+        self._use_flash = use_flash
+        self._overlap_streams = overlap_streams
+        self._checkpoint_pair_updates = checkpoint_pair_updates
         self._is_extra_msa_stack = _is_extra_msa_stack
 
         self.msa_att_row = MSARowAttentionWithPairBias(
@@ -166,6 +347,7 @@ class EvoformerBlock(nn.Module):
         self.msa_transition = MSATransition(
             c_m=c_m,
             n=transition_n,
+            use_triton=fuse_msa_transition,
         )
 
         self.outer_product_mean = OuterProductMean(
@@ -205,6 +387,55 @@ class EvoformerBlock(nn.Module):
         self.ps_dropout_row_layer = DropoutRowwise(pair_dropout)
         self.ps_dropout_col_layer = DropoutColumnwise(pair_dropout)
 
+    @torch.jit.ignore
+    def _checkpointed_pair_updates(self,
+        z: torch.Tensor,
+        pair_mask: torch.Tensor,
+        pair_trans_mask: Optional[torch.Tensor],
+        chunk_size: Optional[int],
+    ) -> torch.Tensor:
+        # Only the input of each update is saved for the backward pass. The
+        # LayerNorms and projections inside are recomputed instead.
+        def checkpoint(module, z, **kwargs):
+            return torch.utils.checkpoint.checkpoint(
+                partial(module, **kwargs), z, use_reentrant=False
+            )
+
+        z = self.ps_dropout_row_layer.residual_add(
+            z, checkpoint(self.tri_mul_out, z, mask=pair_mask)
+        )
+        z = self.ps_dropout_row_layer.residual_add(
+            z, checkpoint(self.tri_mul_in, z, mask=pair_mask)
+        )
+        z = self.ps_dropout_row_layer.residual_add(
+            z,
+            checkpoint(
+                self.tri_att_start,
+                z,
+                mask=pair_mask,
+                chunk_size=chunk_size,
+                use_flash=self._use_flash,
+            ),
+        )
+        z = self.ps_dropout_col_layer.residual_add(
+            z,
+            checkpoint(
+                self.tri_att_end,
+                z,
+                mask=pair_mask,
+                chunk_size=chunk_size,
+                use_flash=self._use_flash,
+            ),
+        )
+        z = z + checkpoint(
+            self.pair_transition,
+            z,
+            mask=pair_trans_mask,
+            chunk_size=chunk_size,
+        )
+
+        return z
+
     def forward(
         self,
         m: torch.Tensor,
@@ -220,23 +451,63 @@ class EvoformerBlock(nn.Module):
         msa_trans_mask = msa_mask if _mask_trans else None
         pair_trans_mask = pair_mask if _mask_trans else None
 
-        m = m + self.msa_dropout_layer(
-            self.msa_att_row(m, z=z, mask=msa_mask, chunk_size=chunk_size)
+        # Dropout is folded into each residual addition, so the
+        # dropped-out update is never materialized
+        m = self.msa_dropout_layer.residual_add(
+            m,
+            self.msa_att_row(
+                m,
+                z=z,
+                mask=msa_mask,
+                chunk_size=chunk_size,
+                use_flash=self._use_flash,
+                overlap_streams=self._overlap_streams,
+            ),
         )
         m = m + self.msa_att_col(m, mask=msa_mask, chunk_size=chunk_size)
         m = m + self.msa_transition(
             m, mask=msa_trans_mask, chunk_size=chunk_size
         )
-        z = z + self.outer_product_mean(
-            m, mask=msa_mask, chunk_size=chunk_size
+        # Where possible, the residual additions below are folded into the
+        # final normalization/gating of each update, so that the updates are
+        # never written out separately
+        z = self.outer_product_mean(
+            m, mask=msa_mask, chunk_size=chunk_size, add_to=z
         )
-        z = z + self.ps_dropout_row_layer(self.tri_mul_out(z, mask=pair_mask))
-        z = z + self.ps_dropout_row_layer(self.tri_mul_in(z, mask=pair_mask))
-        z = z + self.ps_dropout_row_layer(
-            self.tri_att_start(z, mask=pair_mask, chunk_size=chunk_size)
+        if self.training and self._checkpoint_pair_updates:
+            z = self._checkpointed_pair_updates(
+                z, pair_mask, pair_trans_mask, chunk_size
+            )
+            return m, z
+
+        if self.training:
+            z = self.ps_dropout_row_layer.residual_add(
+                z, self.tri_mul_out(z, mask=pair_mask)
+            )
+            z = self.ps_dropout_row_layer.residual_add(
+                z, self.tri_mul_in(z, mask=pair_mask)
+            )
+        else:
+            # Dropout is the identity in eval mode
+            z = self.tri_mul_out(z, mask=pair_mask, add_to=z)
+            z = self.tri_mul_in(z, mask=pair_mask, add_to=z)
+        z = self.ps_dropout_row_layer.residual_add(
+            z,
+            self.tri_att_start(
+                z,
+                mask=pair_mask,
+                chunk_size=chunk_size,
+                use_flash=self._use_flash,
+            ),
         )
-        z = z + self.ps_dropout_col_layer(
-            self.tri_att_end(z, mask=pair_mask, chunk_size=chunk_size)
+        z = self.ps_dropout_col_layer.residual_add(
+            z,
+            self.tri_att_end(
+                z,
+                mask=pair_mask,
+                chunk_size=chunk_size,
+                use_flash=self._use_flash,
+            ),
         )
         z = z + self.pair_transition(
             z, mask=pair_trans_mask, chunk_size=chunk_size
@@ -271,6 +542,14 @@ class EvoformerStack(nn.Module):
         inf: float,
         eps: float,
         clear_cache_between_blocks: bool = False, 
+        use_flash: bool = True,
+        precision: str = "fp32",
+        checkpoint_policy: str = "full",
+        use_cuda_graphs: bool = False,
+        overlap_streams: bool = False,
+        compile_blocks: bool = False,
+        checkpoint_pair_updates: bool = False,
+        fuse_msa_transition: bool = False,
         _is_extra_msa_stack: bool = False,
         **kwargs,
     ):
@@ -306,15 +585,89 @@ class EvoformerStack(nn.Module):
             blocks_per_ckpt:
                 Number of Evoformer blocks in each activation checkpoint
             clear_cache_between_blocks:
-                Whether to clear CUDA's GPU memory cache between blocks of the
-                stack. Slows down each block but can reduce fragmentation
+                Whether to guard against CUDA memory fragmentation between
+                blocks of the stack. On PyTorch 2.1+, this enables the
+                caching allocator's expandable segments (unless
+                PYTORCH_CUDA_ALLOC_CONF is set explicitly) and is otherwise
+                a no-op at runtime. On older versions, CUDA's GPU memory
+                cache is cleared before each block, which synchronizes the
+                device and slows down each block
+            use_flash:
+                Whether to compute the MSA row attention and the triangular
+                attention with fused scaled dot product attention kernels
+                when chunking is disabled. Requires PyTorch 2.1+ and CUDA
+            precision:
+                Precision in which the blocks run on CUDA. Choose from:
+
+                "fp32": Full precision
+                "bf16": bfloat16 autocast, with the residual streams held
+                    in bfloat16 between blocks
+            checkpoint_policy:
+                Which activations are saved within each activation
+                checkpoint. See checkpoint_blocks for the options
+            use_cuda_graphs:
+                Whether to capture each block into a CUDA graph during
+                inference and replay the graphs instead of launching every
+                kernel individually. Only used for CUDA inputs when chunking
+                is disabled and gradients aren't being computed. Graphs are
+                recaptured whenever the input shapes change
+            overlap_streams:
+                Whether to compute the pair bias of each block's MSA row
+                attention on a side CUDA stream, overlapping it with the
+                normalization of the MSA embedding
+            compile_blocks:
+                Whether to run each block through torch.compile (in
+                "reduce-overhead" mode) when activation checkpointing is
+                disabled. Requires PyTorch 2.0+, and is otherwise ignored.
+                Incompatible with use_cuda_graphs and with TorchScripted
+                blocks
+            checkpoint_pair_updates:
+                Whether to checkpoint each pair update (the triangular
+                multiplicative updates, the triangular attention modules,
+                and the pair transition) individually during training.
+                Composes with blocks_per_ckpt, and trades extra recomputation
+                for fewer saved pair activations
+            fuse_msa_transition:
+                Whether to run each block's MSA transition as a single fused
+                Triton kernel during CUDA inference. See MSATransition
         """
         super(EvoformerStack, self).__init__()
 
+        if precision not in ["fp32", "bf16"]:
+            raise ValueError("Invalid precision string.")
+        if checkpoint_policy not in CHECKPOINT_POLICIES:
+            raise ValueError("Invalid checkpoint policy")
+        if use_cuda_graphs and compile_blocks:
+            raise ValueError(
+                "use_cuda_graphs and compile_blocks are mutually exclusive"
+            )
+
         self.blocks_per_ckpt = blocks_per_ckpt
+        self.precision = precision
+        self.checkpoint_policy = checkpoint_policy
         self.clear_cache_between_blocks = clear_cache_between_blocks
+        if(clear_cache_between_blocks and expandable_segments_are_supported):
+            # Segments that grow in place don't fragment the way fixed-size
+            # ones do, so there's no need to empty the cache (and sync the
+            # device) between blocks
+            self.clear_cache_between_blocks = (
+                not _enable_expandable_segments()
+            )
+        self.use_cuda_graphs = use_cuda_graphs
+        self.compile_blocks = compile_blocks and hasattr(torch, "compile")
         self._is_extra_msa_stack = _is_extra_msa_stack
 
+        # Compiled wrappers of self.blocks, created lazily on first use. This
+        # is a plain list rather than a ModuleList so that the wrappers
+        # don't show up in the state dict under new names.
+        self._compiled_blocks = None
+
+        # CUDA graph state, populated lazily by _capture_graphs
+        self._graphs = None
+        self._graph_key = None
+        self._graph_inputs = None
+        self._graph_outputs = None
+
         self.blocks = nn.ModuleList()
 
         for _ in range(no_blocks):
@@ -332,6 +685,10 @@ class EvoformerStack(nn.Module):
                 pair_dropout=pair_dropout,
                 inf=inf,
                 eps=eps,
+                use_flash=use_flash,
+                overlap_streams=overlap_streams,
+                checkpoint_pair_updates=checkpoint_pair_updates,
+                fuse_msa_transition=fuse_msa_transition,
                 _is_extra_msa_stack=_is_extra_msa_stack,
             )
             self.blocks.append(block)
@@ -339,6 +696,121 @@ class EvoformerStack(nn.Module):
         if not self._is_extra_msa_stack:
             self.linear = Linear(c_m, c_s)
 
+    def _capture_graphs(self,
+        m: torch.Tensor,
+        z: torch.Tensor,
+        msa_mask: Optional[torch.Tensor],
+        pair_mask: Optional[torch.Tensor],
+        _mask_trans: bool,
+    ):
+        def clone(t):
+            return t.clone() if t is not None else None
+
+        static_m, static_z = clone(m), clone(z)
+        static_msa_mask, static_pair_mask = clone(msa_mask), clone(pair_mask)
+
+        def run_block(b, m, z):
+            return b(
+                m,
+                z,
+                msa_mask=static_msa_mask,
+                pair_mask=static_pair_mask,
+                chunk_size=None,
+                _mask_trans=_mask_trans,
+            )
+
+        # Capture requires a warmup pass on a side stream
+        stream = torch.cuda.Stream()
+        stream.wait_stream(torch.cuda.current_stream())
+        with torch.cuda.stream(stream):
+            warmup_m, warmup_z = static_m, static_z
+            for b in self.blocks:
+                warmup_m, warmup_z = run_block(b, warmup_m, warmup_z)
+        torch.cuda.current_stream().wait_stream(stream)
+
+        del warmup_m, warmup_z
+
+        # One graph per block, each reading the previous block's static
+        # outputs. Graphs are always replayed in capture order, so they can
+        # share a single memory pool.
+        pool = torch.cuda.graph_pool_handle()
+        graphs = []
+        block_m, block_z = static_m, static_z
+        for b in self.blocks:
+            g = torch.cuda.CUDAGraph()
+            with torch.cuda.graph(g, pool=pool):
+                block_m, block_z = run_block(b, block_m, block_z)
+            graphs.append(g)
+
+        self._graphs = graphs
+        self._graph_inputs = (
+            static_m, static_z, static_msa_mask, static_pair_mask
+        )
+        self._graph_outputs = (block_m, block_z)
+
+    def _run_graphs(self,
+        m: torch.Tensor,
+        z: torch.Tensor,
+        msa_mask: Optional[torch.Tensor],
+        pair_mask: Optional[torch.Tensor],
+        _mask_trans: bool,
+    ) -> Tuple[torch.Tensor, torch.Tensor]:
+        inputs = (m, z, msa_mask, pair_mask)
+        key = tuple(
+            (t.shape, t.dtype, t.device) if t is not None else None
+            for t in inputs
+        ) + (_mask_trans, torch.is_autocast_enabled())
+
+        if(key != self._graph_key):
+            self._capture_graphs(m, z, msa_mask, pair_mask, _mask_trans)
+            self._graph_key = key
+
+        for static_t, t in zip(self._graph_inputs, inputs):
+            if(static_t is not None):
+                static_t.copy_(t)
+
+        for g in self._graphs:
+            g.replay()
+
+        # The static outputs are overwritten by the next replay
+        m, z = self._graph_outputs
+        return m.clone(), z.clone()
+
+    def _get_compiled_blocks(self) -> List[Callable]:
+        if(self._compiled_blocks is None):
+            self._compiled_blocks = [
+                torch.compile(b, mode="reduce-overhead", dynamic=False)
+                for b in self.blocks
+            ]
+
+        return self._compiled_blocks
+
+    def _bind_blocks(self,
+        msa_mask: Optional[torch.Tensor],
+        pair_mask: Optional[torch.Tensor],
+        chunk_size: Optional[int],
+        _mask_trans: bool,
+    ) -> List[Callable]:
+        blocks = [
+            partial(
+                b,
+                msa_mask=msa_mask,
+                pair_mask=pair_mask,
+                chunk_size=chunk_size,
+                _mask_trans=_mask_trans,
+            )
+            for b in self.blocks
+        ]
+
+        if(self.clear_cache_between_blocks):
+            def block_with_cache_clear(block, *args):
+                torch.cuda.empty_cache()
+                return block(*args)
+
+            blocks = [partial(block_with_cache_clear, b) for b in blocks]
+
+        return blocks
+
     def forward(
         self,
         m: torch.Tensor,
@@ -366,36 +838,81 @@ class EvoformerStack(nn.Module):
             s:
                 [*, N_res, C_s] single embedding (or None if extra MSA stack)
         """
-        blocks = [
-            partial(
-                b,
-                msa_mask=msa_mask,
-                pair_mask=pair_mask,
-                chunk_size=chunk_size,
-                _mask_trans=_mask_trans,
-            )
-            for b in self.blocks
-        ]
+        # Blocks run under bfloat16 autocast, with the residual streams
+        # downcast up front and restored to their original dtype at the end
+        orig_dtype = m.dtype
+        use_bf16 = self.precision == "bf16" and m.is_cuda
+        if(use_bf16):
+            m = m.to(dtype=torch.bfloat16)
+            z = z.to(dtype=torch.bfloat16)
 
-        if(self.clear_cache_between_blocks):
-            def block_with_cache_clear(block, *args):
-                torch.cuda.empty_cache()
-                return block(*args)
+            # Downcasting the masks too keeps mask multiplications from
+            # promoting the residual streams back to fp32
+            if(msa_mask is not None):
+                msa_mask = msa_mask.to(dtype=torch.bfloat16)
+            if(pair_mask is not None):
+                pair_mask = pair_mask.to(dtype=torch.bfloat16)
 
-            blocks = [partial(block_with_cache_clear, b) for b in blocks]
+        use_cuda_graphs = (
+            self.use_cuda_graphs and
+            m.is_cuda and
+            chunk_size is None and
+            not self.training and
+            not torch.is_grad_enabled()
+        )
+
+        blocks_per_ckpt = self.blocks_per_ckpt if self.training else None
 
-        m, z = checkpoint_blocks(
-            blocks,
-            args=(m, z),
-            blocks_per_ckpt=self.blocks_per_ckpt if self.training else None,
+        # Entering a disabled autocast context would override any autocast
+        # state set up by the caller. Autocast's cast cache can't be used
+        # while capturing CUDA graphs.
+        autocast = (
+            torch.autocast(
+                device_type="cuda",
+                dtype=torch.bfloat16,
+                cache_enabled=not use_cuda_graphs,
+            )
+            if use_bf16 else nullcontext()
         )
+        with autocast:
+            if(use_cuda_graphs):
+                m, z = self._run_graphs(
+                    m, z, msa_mask, pair_mask, _mask_trans
+                )
+            elif(blocks_per_ckpt is None):
+                # Without checkpointing, the blocks are called directly
+                # rather than through a fresh list of partials
+                blocks = (
+                    self._get_compiled_blocks() if self.compile_blocks
+                    else self.blocks
+                )
+                for b in blocks:
+                    if(self.clear_cache_between_blocks):
+                        torch.cuda.empty_cache()
+                    m, z = b(
+                        m,
+                        z,
+                        msa_mask=msa_mask,
+                        pair_mask=pair_mask,
+                        chunk_size=chunk_size,
+                        _mask_trans=_mask_trans,
+                    )
+            else:
+                m, z = checkpoint_blocks(
+                    self._bind_blocks(
+                        msa_mask, pair_mask, chunk_size, _mask_trans
+                    ),
+                    args=(m, z),
+                    blocks_per_ckpt=blocks_per_ckpt,
+                    checkpoint_policy=self.checkpoint_policy,
+                )
+
+        m = m.to(dtype=orig_dtype)
+        z = z.to(dtype=orig_dtype)
 
         s = None
         if not self._is_extra_msa_stack:
-            seq_dim = -3
-            index = torch.tensor([0], device=m.device)
-            s = self.linear(torch.index_select(m, dim=seq_dim, index=index))
-            s = s.squeeze(seq_dim)
+            s = self.linear(m[..., 0, :, :])
 
         return m, z, s
 
@@ -424,10 +941,27 @@ class ExtraMSAStack(nn.Module):
         inf: float,
         eps: float,
         clear_cache_between_blocks: bool = False,
+        offload_activations: bool = False,
         **kwargs,
     ):
         super(ExtraMSAStack, self).__init__()
 
+        # Non-reentrant checkpoints install saved tensor hooks of their own,
+        # which take precedence over the offloading hooks
+        if offload_activations and (
+            kwargs.get("checkpoint_policy", "full") == "save_matmuls" or
+            kwargs.get("checkpoint_pair_updates", False)
+        ):
+            raise ValueError(
+                "offload_activations is incompatible with the save_matmuls "
+                "checkpoint policy and with checkpoint_pair_updates"
+            )
+
+        # Whether to keep the activations saved for the backward pass in
+        # host memory. Trades PCIe bandwidth for GPU memory when training
+        # on very deep extra MSAs
+        self.offload_activations = offload_activations
+
         c_s = None
         self.stack = EvoformerStack(
             c_m=c_m,
@@ -448,6 +982,7 @@ class ExtraMSAStack(nn.Module):
             eps=eps,
             clear_cache_between_blocks=clear_cache_between_blocks,
             _is_extra_msa_stack=True,
+            **kwargs,
         )
 
     def forward(
@@ -472,12 +1007,18 @@ class ExtraMSAStack(nn.Module):
         Returns:
             [*, N_res, N_res, C_z] pair update
         """
-        _, z, _ = self.stack(
-            m,
-            z,
-            msa_mask=msa_mask,
-            pair_mask=pair_mask,
-            chunk_size=chunk_size,
-            _mask_trans=_mask_trans,
+        offload = (
+            self.offload_activations and
+            m.is_cuda and
+            torch.is_grad_enabled()
         )
+        with offload_saved_tensors() if offload else nullcontext():
+            _, z, _ = self.stack(
+                m,
+                z,
+                msa_mask=msa_mask,
+                pair_mask=pair_mask,
+                chunk_size=chunk_size,
+                _mask_trans=_mask_trans,
+            )
         return z
@@ -116,9 +116,10 @@ class AlphaFold(nn.Module):
         template_embeds = []
         n_templ = batch["template_aatype"].shape[templ_dim]
         for i in range(n_templ):
-            idx = batch["template_aatype"].new_tensor(i)
+            # Narrowing returns a view, so no index tensor is copied to the
+            # device and no gather is launched for each feature
             single_template_feats = tensor_tree_map(
-                lambda t: torch.index_select(t, templ_dim, idx),
+                lambda t: t.narrow(templ_dim, i, 1),
                 batch,
             )
 
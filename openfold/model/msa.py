@@ -13,14 +13,21 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from functools import partial
 import math
 import torch
 import torch.nn as nn
 from typing import Optional, List
 
-from openfold.model.primitives import Linear, Attention, GlobalAttention
+from openfold.model.primitives import (
+    Linear,
+    Attention,
+    GlobalAttention,
+    sdpa_is_available,
+)
 from openfold.utils.tensor_utils import (
     chunk_layer,
+    get_side_stream,
     permute_final_dims,
     flatten_final_dims,
 )
@@ -35,6 +42,7 @@ class MSAAttention(nn.Module):
         pair_bias=False,
         c_z=None,
         inf=1e9,
+        max_chunk_size_mb=512,
     ):
         """
         Args:
@@ -51,6 +59,11 @@ class MSAAttention(nn.Module):
                 is true
             inf:
                 A large number to be used in computing the attention mask
+            max_chunk_size_mb:
+                Memory budget, in MB, for the per-tile activations of the
+                fused attention path (projections, combined bias and
+                outputs). Determines how many MSA rows are processed at once
+                on that path
         """
         super(MSAAttention, self).__init__()
 
@@ -60,6 +73,7 @@ class MSAAttention(nn.Module):
         self.pair_bias = pair_bias
         self.c_z = c_z
         self.inf = inf
+        self.max_chunk_size_mb = max_chunk_size_mb
 
         self.layer_norm_m = nn.LayerNorm(self.c_in)
 
@@ -88,11 +102,73 @@ class MSAAttention(nn.Module):
             no_batch_dims=len(m.shape[:-2]),
         )
 
+    @torch.jit.ignore
+    def _flash_chunk(self,
+        m: torch.Tensor,
+        biases: List[torch.Tensor],
+        chunk_size: Optional[int],
+    ) -> torch.Tensor:
+        n_res = m.shape[-2]
+        h = self.no_heads * self.c_hidden
+
+        # Everything the attention allocates per MSA row: the q, k, v and
+        # gate projections, the attention and output projections, and the
+        # row's summed bias
+        row_bytes = (
+            (5 * n_res * h + n_res * self.c_in + 
+            self.no_heads * n_res * n_res) * m.element_size()
+        )
+        rows = max(1, (self.max_chunk_size_mb * 2 ** 20) // row_bytes)
+        if chunk_size is not None:
+            rows = min(rows, chunk_size)
+
+        return chunk_layer(
+            partial(
+                self.mha, 
+                use_flash=True, 
+                flash_max_bias_mb=self.max_chunk_size_mb,
+            ),
+            {"q_x": m, "k_x": m, "v_x": m, "biases": biases},
+            chunk_size=rows,
+            no_batch_dims=len(m.shape[:-2]),
+        )
+
+    @torch.jit.ignore
+    def _pair_bias_on_side_stream(self, z: torch.Tensor) -> torch.Tensor:
+        current_stream = torch.cuda.current_stream(z.device)
+        side_stream = get_side_stream("pair_bias", z.device)
+
+        side_stream.wait_stream(current_stream)
+        with torch.cuda.stream(side_stream):
+            # [*, N_res, N_res, C_z]
+            z_bias = self.layer_norm_z(z)
+
+            # [*, N_res, N_res, no_heads]
+            z_bias = self.linear_z(z_bias)
+
+            # [*, 1, no_heads, N_res, N_res]
+            z_bias = permute_final_dims(z_bias, (2, 0, 1)).unsqueeze(-4)
+
+        # Keeps the caching allocator from handing out either tensor's memory
+        # while the other stream might still be using it
+        z.record_stream(side_stream)
+        z_bias.record_stream(current_stream)
+
+        return z_bias
+
+    @torch.jit.ignore
+    def _join_side_stream(self, t: torch.Tensor):
+        torch.cuda.current_stream(t.device).wait_stream(
+            get_side_stream("pair_bias", t.device)
+        )
+
     def forward(self, 
         m: torch.Tensor, 
         z: Optional[torch.Tensor] = None, 
         mask: Optional[torch.Tensor] = None, 
         chunk_size: Optional[int] = None,
+        use_flash: bool = False,
+        overlap_streams: bool = False,
     ) -> torch.Tensor:
         """
         Args:
@@ -107,8 +183,26 @@ class MSAAttention(nn.Module):
                 Size of chunks into which the inputs are split along their
                 batch dimensions. A low value decreases memory overhead at the 
                 cost of slower execution. Chunking is not performed by default.
+            use_flash:
+                Whether to use fused scaled dot product attention kernels.
+                With pair bias enabled, CUDA inputs are processed in tiles of
+                rows sized from max_chunk_size_mb, capped at chunk_size if
+                one is given. Otherwise ignored when chunk_size is set
+            overlap_streams:
+                Whether to project the pair bias on a separate CUDA stream,
+                concurrently with the normalization of the MSA embedding
                 
         """
+        # The pair bias only depends on z, so for CUDA inputs it can be
+        # computed while the main stream works on m
+        z_bias: Optional[torch.Tensor] = None
+        if (overlap_streams and
+            self.pair_bias and
+            z is not None and
+            z.is_cuda
+        ):
+            z_bias = self._pair_bias_on_side_stream(z)
+
         # [*, N_seq, N_res, C_m]
         m = self.layer_norm_m(m)
 
@@ -131,7 +225,10 @@ class MSAAttention(nn.Module):
         
         biases = [bias]
 
-        if (self.pair_bias and 
+        if z_bias is not None:
+            self._join_side_stream(z_bias)
+            biases.append(z_bias)
+        elif (self.pair_bias and 
             z is not None and                       # For the 
             self.layer_norm_z is not None and       # benefit of
             self.linear_z is not None               # TorchScript
@@ -147,10 +244,18 @@ class MSAAttention(nn.Module):
 
             biases.append(z)
 
-        if chunk_size is not None:
+        if (use_flash and
+            self.pair_bias and
+            sdpa_is_available and
+            m.is_cuda
+        ):
+            m = self._flash_chunk(m, biases, chunk_size)
+        elif chunk_size is not None:
             m = self._chunk(m, biases, chunk_size)
         else:
-            m = self.mha(q_x=m, k_x=m, v_x=m, biases=biases)
+            m = self.mha(
+                q_x=m, k_x=m, v_x=m, biases=biases, use_flash=use_flash
+            )
 
         return m
 
@@ -160,7 +265,9 @@ class MSARowAttentionWithPairBias(MSAAttention):
     Implements Algorithm 7.
     """
 
-    def __init__(self, c_m, c_z, c_hidden, no_heads, inf=1e9):
+    def __init__(
+        self, c_m, c_z, c_hidden, no_heads, inf=1e9, max_chunk_size_mb=512
+    ):
         """
         Args:
             c_m:
@@ -173,6 +280,8 @@ class MSARowAttentionWithPairBias(MSAAttention):
                 Number of attention heads
             inf:
                 Large number used to construct attention masks
+            max_chunk_size_mb:
+                Memory budget for the attention bias on the fused path
         """
         super(MSARowAttentionWithPairBias, self).__init__(
             c_m,
@@ -181,6 +290,7 @@ class MSARowAttentionWithPairBias(MSAAttention):
             pair_bias=True,
             c_z=c_z,
             inf=inf,
+            max_chunk_size_mb=max_chunk_size_mb,
         )
 
 
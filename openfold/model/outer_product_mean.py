@@ -87,10 +87,19 @@ class OuterProductMean(nn.Module):
 
         return outer
 
+    @torch.jit.ignore
+    def _norm(self, mask: torch.Tensor) -> torch.Tensor:
+        # Counts of aligned sequences can exceed what reduced-precision types
+        # represent exactly, so this is always accumulated in fp32
+        with torch.cuda.amp.autocast(enabled=False):
+            mask = mask.float()
+            return torch.einsum("...abc,...adc->...bdc", mask, mask)
+
     def forward(self, 
         m: torch.Tensor, 
         mask: Optional[torch.Tensor] = None,
-        chunk_size: Optional[int] = None
+        chunk_size: Optional[int] = None,
+        add_to: Optional[torch.Tensor] = None,
     ) -> torch.Tensor:
         """
         Args:
@@ -98,12 +107,19 @@ class OuterProductMean(nn.Module):
                 [*, N_seq, N_res, C_m] MSA embedding
             mask:
                 [*, N_seq, N_res] MSA mask
+            add_to:
+                Optional [*, N_res, N_res, C_z] pair embedding. If provided,
+                the update is added to it as part of the normalization
+                rather than returned on its own
         Returns:
-            [*, N_res, N_res, C_z] pair embedding update
+            [*, N_res, N_res, C_z] pair embedding update (or updated pair
+            embedding, if add_to is provided)
         """
         if mask is None:
             mask = m.new_ones(m.shape[:-1])
 
+        dtype = m.dtype
+
         # [*, N_seq, N_res, C_m]
         m = self.layer_norm(m)
 
@@ -121,9 +137,17 @@ class OuterProductMean(nn.Module):
             outer = self._opm(a, b)
 
         # [*, N_res, N_res, 1]
-        norm = torch.einsum("...abc,...adc->...bdc", mask, mask)
+        norm = self._norm(mask)
 
         # [*, N_res, N_res, C_z]
-        outer = outer / (self.eps + norm)
+        if add_to is not None:
+            # Out of place, since add_to may still be needed for autograd.
+            # Only the count is cast, so that neither N_res^2 * C_z operand
+            # gets an fp32 copy
+            outer = torch.addcdiv(
+                add_to, outer, (self.eps + norm).to(dtype=outer.dtype)
+            )
+        else:
+            outer = outer.float() / (self.eps + norm)
 
-        return outer
+        return outer.to(dtype=dtype)
@@ -13,6 +13,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import itertools
 import math
 from typing import Optional, Callable, List, Tuple, Sequence
 import numpy as np
@@ -29,6 +30,17 @@ from openfold.utils.tensor_utils import (
 )
 
 
+_torch_version = tuple(
+    int(v) for v in torch.__version__.split("+")[0].split(".")[:2]
+)
+
+# F.scaled_dot_product_attention ships with PyTorch 2.0, but its fused
+# kernels only accept an additive attn_mask from 2.1 onwards
+sdpa_is_available = (
+    hasattr(F, "scaled_dot_product_attention") and _torch_version >= (2, 1)
+)
+
+
 def _prod(nums):
     out = 1
     for n in nums:
@@ -322,6 +334,8 @@ class Attention(nn.Module):
         k_x: torch.Tensor,
         v_x: torch.Tensor,
         biases: Optional[List[torch.Tensor]] = None,
+        use_flash: bool = False,
+        flash_max_bias_mb: int = 512,
     ) -> torch.Tensor:
         """
         Args:
@@ -331,6 +345,13 @@ class Attention(nn.Module):
                 [*, K, C_k] key data
             v_x:
                 [*, V, C_v] value data
+            use_flash:
+                Whether to compute attention with PyTorch's fused
+                scaled_dot_product_attention kernels. Only takes effect for
+                CUDA inputs on PyTorch 2.1+
+            flash_max_bias_mb:
+                Memory budget, in MB, for the combined attention bias that
+                the fused kernels receive. Ignored unless use_flash is set
         Returns
             [*, Q, C_q] attention update
         """
@@ -344,34 +365,50 @@ class Attention(nn.Module):
         k = k.view(k.shape[:-1] + (self.no_heads, -1))
         v = v.view(v.shape[:-1] + (self.no_heads, -1))
 
-        # [*, H, Q, C_hidden]
-        q = permute_final_dims(q, (1, 0, 2))
+        if(use_flash and sdpa_is_available and q.is_cuda):
+            flash_biases: List[torch.Tensor] = []
+            if biases is not None:
+                flash_biases = biases
 
-        # [*, H, C_hidden, K]
-        k = permute_final_dims(k, (1, 2, 0))
+            # [*, Q, H, C_hidden]
+            o = _flash_attn(
+                q, k, v, flash_biases, flash_max_bias_mb
+            )
+        else:
+            # [*, H, Q, C_hidden]
+            q = permute_final_dims(q, (1, 0, 2))
 
-        # [*, H, Q, K]
-        a = torch.matmul(q, k)
+            # [*, H, C_hidden, K]
+            k = permute_final_dims(k, (1, 2, 0))
 
-        del q, k
+            # The queries are scaled rather than the logits, and the first
+            # bias is added out of place, so that the matmul output is never
+            # modified in place. Selective activation checkpointing may have
+            # saved it for the backward pass.
+            norm = 1 / math.sqrt(self.c_hidden)  # [1]
+            q = q * norm
 
-        norm = 1 / math.sqrt(self.c_hidden)  # [1]
-        a *= norm
+            # [*, H, Q, K]
+            a = torch.matmul(q, k)
 
-        if biases is not None:
-            for b in biases:
-                a += b
+            del q, k
 
-        a = self.softmax(a)
+            if biases is not None and len(biases) > 0:
+                a = a + biases[0]
+                for b in biases[1:]:
+                    a += b
+
+            a = self.softmax(a)
 
-        # [*, H, V, C_hidden]
-        v = permute_final_dims(v, (1, 0, 2))
+            # [*, H, V, C_hidden]
+            v = permute_final_dims(v, (1, 0, 2))
 
-        # [*, H, Q, C_hidden]
-        o = torch.matmul(a, v)
+            # [*, H, Q, C_hidden]
+            o = torch.matmul(a, v)
+
+            # [*, Q, H, C_hidden]
+            o = o.transpose(-2, -3)
 
-        # [*, Q, H, C_hidden]
-        o = o.transpose(-2, -3)
         if(self.linear_g is not None):
             g = self.sigmoid(self.linear_g(q_x))
             # [*, Q, H, C_hidden]
@@ -387,6 +424,106 @@ class Attention(nn.Module):
         return o
 
 
+@torch.jit.ignore
+def _flash_attn(
+    q: torch.Tensor,
+    k: torch.Tensor,
+    v: torch.Tensor,
+    biases: List[torch.Tensor],
+    max_bias_mb: int = 512,
+) -> torch.Tensor:
+    """
+    Computes softmax(q @ k^T / sqrt(C_hidden) + sum(biases)) @ v with
+    PyTorch's fused attention kernels, which never materialize the attention
+    logits in global memory.
+
+    The kernels accept a single additive mask, so the biases still have to
+    be summed. To bound the size of that sum, the last batch dimension is
+    processed in tiles, and any other batch dimensions are looped over.
+
+    Args:
+        q:
+            [*, Q, H, C_hidden] queries
+        k:
+            [*, K, H, C_hidden] keys
+        v:
+            [*, V, H, C_hidden] values
+        biases:
+            List of biases broadcastable to [*, H, Q, K]
+        max_bias_mb:
+            Memory budget, in MB, for the combined bias of each tile
+    Returns:
+        [*, Q, H, C_hidden] attention output
+    """
+    # The memory-efficient kernel supports fp32 too, so the inputs are
+    # left in whatever precision the caller runs in
+    dtype = q.dtype
+
+    # [*, H, Q/K/V, C_hidden]
+    q = q.transpose(-2, -3)
+    k = k.transpose(-2, -3)
+    v = v.transpose(-2, -3)
+
+    no_batch_dims = len(q.shape[:-3])
+    if(no_batch_dims == 0):
+        q, k, v = q.unsqueeze(0), k.unsqueeze(0), v.unsqueeze(0)
+
+    batch_dims = q.shape[:-3]
+    no_heads, n_q, _ = q.shape[-3:]
+    n_k = k.shape[-2]
+
+    # Each bias is cast on its own, before broadcasting, and remains a
+    # view until the biases of a single tile are summed
+    bias_views = []
+    for b in biases:
+        b = b.to(dtype=dtype)
+        if(dtype == torch.float16):
+            # Large negative mask values overflow to -inf in fp16
+            b = b.clamp(min=torch.finfo(dtype).min)
+        bias_views.append(b.expand(batch_dims + (no_heads, n_q, n_k)))
+
+    n_rows = batch_dims[-1]
+    row_bytes = no_heads * n_q * n_k * q.element_size()
+    tile = max(1, (max_bias_mb * 2 ** 20) // row_bytes)
+
+    # [*, H, Q, C_hidden]
+    o = q.new_empty(q.shape[:-1] + v.shape[-1:])
+
+    leading_dims = [range(d) for d in batch_dims[:-1]]
+    for idx in itertools.product(*leading_dims):
+        for start in range(0, n_rows, tile):
+            s = idx + (slice(start, start + tile),)
+
+            # [T, H, Q, K]
+            bias = None
+            for b in bias_views:
+                bias = b[s] if bias is None else bias + b[s]
+
+            o[s] = _sdpa(q[s], k[s], v[s], bias)
+
+    if(no_batch_dims == 0):
+        o = o.squeeze(0)
+
+    # [*, Q, H, C_hidden]
+    return o.transpose(-2, -3)
+
+
+@torch.jit.ignore
+def _sdpa(
+    q: torch.Tensor,
+    k: torch.Tensor,
+    v: torch.Tensor,
+    bias: Optional[torch.Tensor],
+) -> torch.Tensor:
+    # FlashAttention proper doesn't accept an additive mask, so biased calls
+    # are served by the memory-efficient kernel instead. Neither materializes
+    # the [B, H, Q, K] logits.
+    with torch.backends.cuda.sdp_kernel(
+        enable_flash=True, enable_math=False, enable_mem_efficient=True
+    ):
+        return F.scaled_dot_product_attention(q, k, v, attn_mask=bias)
+
+
 class GlobalAttention(nn.Module):
     def __init__(self, c_in, c_hidden, no_heads, inf, eps):
         super(GlobalAttention, self).__init__()
@@ -421,7 +558,7 @@ class GlobalAttention(nn.Module):
 
         # [*, N_res, H * C_hidden]
         q = self.linear_q(q)
-        q *= (self.c_hidden ** (-0.5))
+        q = q * (self.c_hidden ** (-0.5))
 
         # [*, N_res, H, C_hidden]
         q = q.view(q.shape[:-1] + (self.no_heads, -1))
@@ -436,7 +573,7 @@ class GlobalAttention(nn.Module):
             k.transpose(-1, -2),  # [*, N_res, C_hidden, N_seq]
         )
         bias = (self.inf * (mask - 1))[..., :, None, :]
-        a += bias
+        a = a + bias
         a = self.softmax(a)
 
         # [*, N_res, H, C_hidden]
@@ -497,7 +634,7 @@ def _lma(
             )
         
             for b in small_bias_chunks:
-                a += b
+                a = a + b
         
             a = a.transpose(-2, -3)
   
@@ -0,0 +1,54 @@
+# Copyright 2021 AlQuraishi Laboratory
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import torch
+import torch.nn as nn
+
+from openfold.model.evoformer import MSATransition
+
+
+def _quantize_linear(linear: nn.Linear) -> nn.Module:
+    # from_float only accepts exact nn.Linear instances, not subclasses like
+    # openfold.model.primitives.Linear, so the weights are rewrapped first
+    float_linear = nn.Linear(
+        linear.in_features,
+        linear.out_features,
+        bias=(linear.bias is not None),
+    )
+    float_linear.weight = linear.weight
+    float_linear.bias = linear.bias
+    float_linear.qconfig = torch.quantization.per_channel_dynamic_qconfig
+
+    return torch.nn.quantized.dynamic.Linear.from_float(float_linear)
+
+
+def quantize_msa_transitions_(model: nn.Module):
+    """
+    Replaces the linear layers of every MSATransition in the model with
+    int8 dynamically quantized equivalents, in place. Weights are quantized
+    with per-output-channel scales up front, while activation scales are
+    computed on the fly, so no calibration pass is required.
+
+    Dynamically quantized layers only run on the CPU, and only support
+    inference. This function must be called before script_preset_.
+
+    Args:
+        model:
+            A torch.nn.Module. It should contain at least one
+            MSATransition, or this function won't do anything.
+    """
+    for module in model.modules():
+        if(isinstance(module, MSATransition)):
+            module.linear_1 = _quantize_linear(module.linear_1)
+            module.linear_2 = _quantize_linear(module.linear_2)
@@ -79,12 +79,16 @@ class TriangleAttention(nn.Module):
     def forward(self, 
         x: torch.Tensor, 
         mask: Optional[torch.Tensor] = None,
-        chunk_size: Optional[int] = None
+        chunk_size: Optional[int] = None,
+        use_flash: bool = False,
     ) -> torch.Tensor:
         """
         Args:
             x:
                 [*, I, J, C_in] input tensor (e.g. the pair representation)
+            use_flash:
+                Whether to use fused scaled dot product attention kernels.
+                Ignored when chunk_size is set
         Returns:
             [*, I, J, C_in] output tensor
         """
@@ -116,7 +120,13 @@ class TriangleAttention(nn.Module):
         if chunk_size is not None:
             x = self._chunk(x, biases, chunk_size)
         else:
-            x = self.mha(q_x=x, k_x=x, v_x=x, biases=biases)
+            x = self.mha(
+                q_x=x,
+                k_x=x,
+                v_x=x,
+                biases=biases,
+                use_flash=use_flash,
+            )
 
         if not self.starting:
             x = x.transpose(-2, -3)
@@ -58,9 +58,45 @@ class TriangleMultiplicativeUpdate(nn.Module):
     ) -> torch.Tensor:
         raise NotImplementedError("This method needs to be overridden")
 
+    def _bmm(self, a: torch.Tensor, b: torch.Tensor) -> torch.Tensor:
+        # The batch and channel dimensions are flattened into a single batch
+        # dimension, so that the whole contraction is one bmm call
+        out = torch.bmm(
+            a.reshape([-1, a.shape[-2], a.shape[-1]]),
+            b.reshape([-1, b.shape[-2], b.shape[-1]]),
+        )
+        return out.reshape(a.shape[:-1] + b.shape[-1:])
+
+    def _input_projections(self, z: torch.Tensor) -> torch.Tensor:
+        # The four input projections are computed with a single GEMM. The
+        # weights are concatenated on the fly, so the parameters (and the
+        # state dict) are unchanged.
+        weight = torch.cat(
+            [
+                self.linear_a_p.weight,
+                self.linear_a_g.weight,
+                self.linear_b_p.weight,
+                self.linear_b_g.weight,
+            ],
+            dim=0,
+        )
+        bias = torch.cat(
+            [
+                self.linear_a_p.bias,
+                self.linear_a_g.bias,
+                self.linear_b_p.bias,
+                self.linear_b_g.bias,
+            ],
+            dim=0,
+        )
+
+        # [*, N_res, N_res, 4 * C]
+        return nn.functional.linear(z, weight, bias)
+
     def forward(self, 
         z: torch.Tensor, 
-        mask: Optional[torch.Tensor] = None
+        mask: Optional[torch.Tensor] = None,
+        add_to: Optional[torch.Tensor] = None,
     ) -> torch.Tensor:
         """
         Args:
@@ -68,6 +104,9 @@ class TriangleMultiplicativeUpdate(nn.Module):
                 [*, N_res, N_res, C_z] input tensor
             mask:
                 [*, N_res, N_res] input mask
+            add_to:
+                Optional [*, N_res, N_res, C_z] tensor to which the output
+                is added as part of the final gating
         Returns:
             [*, N_res, N_res, C_z] output tensor
         """
@@ -77,14 +116,35 @@ class TriangleMultiplicativeUpdate(nn.Module):
         mask = mask.unsqueeze(-1)
 
         z = self.layer_norm_in(z)
-        a = self.linear_a_p(z) * self.sigmoid(self.linear_a_g(z))
+        a_p, a_g, b_p, b_g = self._input_projections(z).chunk(4, dim=-1)
+        a = a_p * self.sigmoid(a_g)
         a = a * mask
-        b = self.linear_b_p(z) * self.sigmoid(self.linear_b_g(z))
+        b = b_p * self.sigmoid(b_g)
         b = b * mask
+
+        # The four projections are views of one [*, N_res, N_res, 4 * C]
+        # buffer, which can be freed once a and b exist
+        del a_p, a_g, b_p, b_g
+
+        # The projections are laid out channels-first exactly once, so that
+        # the contraction over N_res below reads each channel's [N_res, N_res]
+        # matrix contiguously
+        # [*, C, N_res, N_res]
+        a = permute_final_dims(a, (2, 0, 1)).contiguous()
+        b = permute_final_dims(b, (2, 0, 1)).contiguous()
+
+        # [*, C, N_res, N_res]
         x = self._combine_projections(a, b)
+
+        # [*, N_res, N_res, C]
+        x = permute_final_dims(x, (1, 2, 0))
         x = self.layer_norm_out(x)
         x = self.linear_z(x)
         g = self.sigmoid(self.linear_g(z))
+
+        if add_to is not None:
+            return torch.addcmul(add_to, x, g)
+
         z = x * g
 
         return z
@@ -95,17 +155,11 @@ class TriangleMultiplicationOutgoing(TriangleMultiplicativeUpdate):
     Implements Algorithm 11.
     """
     def _combine_projections(self,
-        a: torch.Tensor,  # [*, N_i, N_k, C]
-        b: torch.Tensor,  # [*, N_j, N_k, C]
+        a: torch.Tensor,  # [*, C, N_i, N_k]
+        b: torch.Tensor,  # [*, C, N_j, N_k]
     ):
         # [*, C, N_i, N_j]
-        p = torch.matmul(
-            permute_final_dims(a, (2, 0, 1)),
-            permute_final_dims(b, (2, 1, 0)),
-        )
-
-        # [*, N_i, N_j, C]
-        return permute_final_dims(p, (1, 2, 0))
+        return self._bmm(a, b.transpose(-1, -2))
 
 
 class TriangleMultiplicationIncoming(TriangleMultiplicativeUpdate):
@@ -113,15 +167,9 @@ class TriangleMultiplicationIncoming(TriangleMultiplicativeUpdate):
     Implements Algorithm 12.
     """
     def _combine_projections(self,
-        a: torch.Tensor,  # [*, N_k, N_i, C]
-        b: torch.Tensor,  # [*, N_k, N_j, C]
+        a: torch.Tensor,  # [*, C, N_k, N_i]
+        b: torch.Tensor,  # [*, C, N_k, N_j]
     ):
         # [*, C, N_i, N_j]
-        p = torch.matmul(
-            permute_final_dims(a, (2, 1, 0)),
-            permute_final_dims(b, (2, 0, 1)),
-        )
-
-        # [*, N_i, N_j, C]
-        return permute_final_dims(p, (1, 2, 0))
+        return self._bmm(a.transpose(-1, -2), b)
 
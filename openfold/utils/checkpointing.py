@@ -14,18 +14,41 @@
 
 import deepspeed
 import torch
+import torch.nn as nn
 import torch.utils.checkpoint
+from functools import partial
 from typing import Any, Tuple, List, Callable
 
+from openfold.utils.tensor_utils import get_side_stream
+
 
 BLOCK_ARG = Any
 BLOCK_ARGS = List[BLOCK_ARG]
 
+CHECKPOINT_POLICIES = ["full", "save_matmuls"]
+
+# Selective activation checkpointing was introduced in PyTorch 2.4
+selective_checkpointing_is_available = hasattr(
+    torch.utils.checkpoint, "create_selective_checkpoint_contexts"
+)
+
+# Ops whose outputs the "save_matmuls" policy keeps around for the backward
+# pass. Everything else (softmax, ReLU, LayerNorm, dropout, etc.) is cheap
+# to recompute. Saved outputs must never be modified in place downstream,
+# or the backward pass would see the modified values.
+MATMUL_OPS = [
+    torch.ops.aten.mm.default,
+    torch.ops.aten.bmm.default,
+    torch.ops.aten.addmm.default,
+]
+
+
 @torch.jit.ignore
 def checkpoint_blocks(
     blocks: List[Callable],
     args: BLOCK_ARGS,
     blocks_per_ckpt: int,
+    checkpoint_policy: str = "full",
 ) -> BLOCK_ARGS:
     """
     Chunk a list of blocks and run each chunk with activation
@@ -43,6 +66,15 @@ def checkpoint_blocks(
             Size of each chunk. A higher value corresponds to fewer 
             checkpoints, and trades memory for speed. If None, no checkpointing 
             is performed.
+        checkpoint_policy:
+            Which activations are kept inside each checkpoint. Choose from:
+
+            "full": Only the inputs to each chunk are saved; everything
+                else is recomputed during the backward pass
+            "save_matmuls": The outputs of matrix multiplications are saved
+                as well, and only the cheaper ops between them are
+                recomputed. Requires PyTorch 2.4+; falls back to "full"
+                otherwise
     Returns:
         The output of the final block
     """
@@ -68,7 +100,21 @@ def checkpoint_blocks(
     elif blocks_per_ckpt < 1 or blocks_per_ckpt > len(blocks):
         raise ValueError("blocks_per_ckpt must be between 1 and len(blocks)")
 
-    if(deepspeed.checkpointing.is_configured()):
+    if checkpoint_policy not in CHECKPOINT_POLICIES:
+        raise ValueError("Invalid checkpoint policy")
+
+    if(checkpoint_policy == "save_matmuls" and
+        selective_checkpointing_is_available
+    ):
+        checkpoint = partial(
+            torch.utils.checkpoint.checkpoint,
+            use_reentrant=False,
+            context_fn=partial(
+                torch.utils.checkpoint.create_selective_checkpoint_contexts,
+                MATMUL_OPS,
+            ),
+        )
+    elif(deepspeed.checkpointing.is_configured()):
         checkpoint = deepspeed.checkpointing.checkpoint
     else:
         checkpoint = torch.utils.checkpoint.checkpoint
@@ -79,3 +125,55 @@ def checkpoint_blocks(
         args = wrap(args)
 
     return args
+
+
+def _pack_to_cpu(t: torch.Tensor) -> Any:
+    # Parameters are kept alive by the model anyway
+    if isinstance(t, nn.Parameter) or not t.is_cuda:
+        return t
+
+    current_stream = torch.cuda.current_stream(t.device)
+    offload_stream = get_side_stream("offload", t.device)
+
+    # The copy runs on a side stream, so that it overlaps with the compute
+    # that follows on the current stream
+    offload_stream.wait_stream(current_stream)
+    with torch.cuda.stream(offload_stream):
+        cpu_t = torch.empty(t.shape, dtype=t.dtype, pin_memory=True)
+        cpu_t.copy_(t, non_blocking=True)
+        event = torch.cuda.Event()
+        event.record(offload_stream)
+
+    # Keeps the caching allocator from reusing t's memory until the copy
+    # is done
+    t.record_stream(offload_stream)
+
+    return (t.device, cpu_t, event)
+
+
+def _unpack_from_cpu(packed: Any) -> torch.Tensor:
+    if isinstance(packed, torch.Tensor):
+        return packed
+
+    device, cpu_t, event = packed
+    torch.cuda.current_stream(device).wait_event(event)
+
+    return cpu_t.to(device=device, non_blocking=True)
+
+
+def offload_saved_tensors() -> torch.autograd.graph.saved_tensors_hooks:
+    """
+    Returns a context manager under which tensors saved for the backward
+    pass are moved to pinned host memory as soon as they're saved, and
+    moved back to the GPU when the backward pass needs them. The copies to
+    the host are asynchronous and overlap with subsequent computation.
+
+    Combined with checkpoint_blocks under the "full" policy, only the
+    inputs to each checkpoint are saved, so those are what end up on the
+    host. Non-reentrant checkpoints (the "save_matmuls" policy) install
+    their own hooks, which take precedence over these, so nothing is
+    offloaded inside them.
+    """
+    return torch.autograd.graph.saved_tensors_hooks(
+        _pack_to_cpu, _unpack_from_cpu
+    )
@@ -0,0 +1,208 @@
+# Copyright 2021 AlQuraishi Laboratory
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import importlib
+from typing import Optional
+
+import torch
+
+triton_is_installed = importlib.util.find_spec("triton") is not None
+if(triton_is_installed):
+    import triton
+    import triton.language as tl
+
+
+# Candidate numbers of rows of the flattened MSA processed by each program
+BLOCK_M_CANDIDATES = [64, 32, 16]
+# Slice of the hidden dimension held on-chip at any one time
+BLOCK_H = 16
+# Shared memory budget for the tiles resident in each program. Fits the
+# limits of common inference GPUs (V100, RTX 30xx/40xx) with room to spare
+SMEM_BUDGET_BYTES = 64 * 2 ** 10
+
+
+if(triton_is_installed):
+    @triton.jit
+    def _msa_transition_fused_kernel(
+        m_ptr,
+        w1_ptr,
+        b1_ptr,
+        w2_ptr,
+        b2_ptr,
+        gamma_ptr,
+        beta_ptr,
+        mask_ptr,
+        out_ptr,
+        N,
+        C_m,
+        C_hidden,
+        eps,
+        BLOCK_M: tl.constexpr,
+        BLOCK_C: tl.constexpr,
+        BLOCK_H: tl.constexpr,
+        HAS_MASK: tl.constexpr,
+    ):
+        pid = tl.program_id(0)
+        rows = pid * BLOCK_M + tl.arange(0, BLOCK_M)
+        cols = tl.arange(0, BLOCK_C)
+        row_mask = rows < N
+        col_mask = cols < C_m
+        io_mask = row_mask[:, None] & col_mask[None, :]
+
+        # [BLOCK_M, BLOCK_C]
+        x = tl.load(
+            m_ptr + rows[:, None] * C_m + cols[None, :],
+            mask=io_mask,
+            other=0.,
+        ).to(tl.float32)
+
+        # LayerNorm, with statistics accumulated in fp32
+        mean = tl.sum(x, axis=1) / C_m
+        x = tl.where(io_mask, x - mean[:, None], 0.)
+        var = tl.sum(x * x, axis=1) / C_m
+        rstd = 1. / tl.sqrt(var + eps)
+        gamma = tl.load(gamma_ptr + cols, mask=col_mask, other=0.)
+        beta = tl.load(beta_ptr + cols, mask=col_mask, other=0.)
+        x = (
+            x * rstd[:, None] * gamma.to(tl.float32)[None, :] +
+            beta.to(tl.float32)[None, :]
+        )
+        x = x.to(w1_ptr.dtype.element_ty)
+
+        # The [BLOCK_M, C_hidden] activation is never written out. Instead,
+        # each slice of it is consumed by linear_2 as soon as it's computed.
+        acc = tl.zeros((BLOCK_M, BLOCK_C), dtype=tl.float32)
+        for h_start in range(0, C_hidden, BLOCK_H):
+            hs = h_start + tl.arange(0, BLOCK_H)
+            h_mask = hs < C_hidden
+
+            # [BLOCK_C, BLOCK_H] (linear_1.weight is [C_hidden, C_m])
+            w1 = tl.load(
+                w1_ptr + hs[None, :] * C_m + cols[:, None],
+                mask=col_mask[:, None] & h_mask[None, :],
+                other=0.,
+            )
+            b1 = tl.load(b1_ptr + hs, mask=h_mask, other=0.)
+
+            # [BLOCK_M, BLOCK_H]
+            h = tl.dot(x, w1) + b1.to(tl.float32)[None, :]
+            h = tl.maximum(h, 0.)
+
+            # [BLOCK_H, BLOCK_C] (linear_2.weight is [C_m, C_hidden])
+            w2 = tl.load(
+                w2_ptr + cols[None, :] * C_hidden + hs[:, None],
+                mask=h_mask[:, None] & col_mask[None, :],
+                other=0.,
+            )
+
+            acc += tl.dot(h.to(w2.dtype), w2)
+
+        b2 = tl.load(b2_ptr + cols, mask=col_mask, other=0.)
+        out = acc + b2.to(tl.float32)[None, :]
+        if HAS_MASK:
+            scale = tl.load(mask_ptr + rows, mask=row_mask, other=0.)
+            out = out * scale.to(tl.float32)[:, None]
+
+        tl.store(
+            out_ptr + rows[:, None] * C_m + cols[None, :],
+            out.to(out_ptr.dtype.element_ty),
+            mask=io_mask,
+        )
+
+
+def _pick_block_m(block_c: int, element_size: int) -> int:
+    """
+    Picks the largest row tile for which the input tile, both weight tiles,
+    and the hidden activation tile fit in the shared memory budget.
+    """
+    for block_m in BLOCK_M_CANDIDATES:
+        elements = (
+            block_m * block_c +         # x
+            2 * block_c * BLOCK_H +     # w1, w2
+            block_m * BLOCK_H           # h
+        )
+        if(elements * element_size <= SMEM_BUDGET_BYTES):
+            return block_m
+
+    raise ValueError(
+        f"Padded C_m of {block_c} is too large for the fused MSA transition"
+    )
+
+
+def msa_transition_fused(
+    m: torch.Tensor,
+    mask: Optional[torch.Tensor],
+    layer_norm: torch.nn.LayerNorm,
+    linear_1: torch.nn.Linear,
+    linear_2: torch.nn.Linear,
+) -> torch.Tensor:
+    """
+    Computes linear_2(relu(linear_1(layer_norm(m)))) * mask in a single
+    Triton kernel. Forward pass only.
+
+    Args:
+        m:
+            [*, N_seq, N_res, C_m] MSA activation
+        mask:
+            [*, N_seq, N_res] MSA mask. If None, the output is left
+            unmasked
+    Returns:
+        [*, N_seq, N_res, C_m] MSA activation update
+    """
+    c_m = m.shape[-1]
+    c_hidden = linear_1.weight.shape[0]
+
+    # tl.dot needs every block dimension to be at least 16
+    block_c = max(triton.next_power_of_2(c_m), 16)
+    # The normalized input is cast to the weights' dtype before it's staged
+    # for tl.dot, so whichever of the two is wider determines the footprint
+    block_m = _pick_block_m(
+        block_c, max(m.element_size(), linear_1.weight.element_size())
+    )
+
+    m_flat = m.reshape(-1, c_m).contiguous()
+    n = m_flat.shape[0]
+
+    # The mask pointer is never dereferenced when HAS_MASK is False
+    has_mask = mask is not None
+    if(has_mask):
+        mask_flat = mask.expand(m.shape[:-1]).reshape(-1).contiguous()
+    else:
+        mask_flat = m_flat
+
+    out = torch.empty_like(m_flat)
+
+    grid = (triton.cdiv(n, block_m),)
+    _msa_transition_fused_kernel[grid](
+        m_flat,
+        linear_1.weight.contiguous(),
+        linear_1.bias,
+        linear_2.weight.contiguous(),
+        linear_2.bias,
+        layer_norm.weight,
+        layer_norm.bias,
+        mask_flat,
+        out,
+        n,
+        c_m,
+        c_hidden,
+        layer_norm.eps,
+        BLOCK_M=block_m,
+        BLOCK_C=block_c,
+        BLOCK_H=BLOCK_H,
+        HAS_MASK=has_mask,
+        num_warps=4,
+        num_stages=1,
+    )
+
+    return out.view(m.shape)
@@ -19,6 +19,22 @@ import torch.nn as nn
 from typing import Tuple, List, Callable, Any, Dict, Sequence, Optional
 
 
+# Lazily created side streams, keyed by purpose and device
+_side_streams: Dict[Tuple[str, torch.device], torch.cuda.Stream] = {}
+
+
+def get_side_stream(name: str, device: torch.device) -> torch.cuda.Stream:
+    """
+    Returns a CUDA stream dedicated to the given purpose on the given
+    device, creating it on first use. Work queued under different names
+    never serializes on a shared side stream.
+    """
+    key = (name, device)
+    if key not in _side_streams:
+        _side_streams[key] = torch.cuda.Stream(device=device)
+    return _side_streams[key]
+
+
 def permute_final_dims(tensor: torch.Tensor, inds: List[int]):
     zero_index = -1 * len(inds)
     first_inds = list(range(len(tensor.shape[:zero_index])))
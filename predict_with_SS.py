@@ -49,6 +49,7 @@ torch.set_grad_enabled(False)
 from openfold.config_SS import model_config, NUM_RES
 from openfold.data import templates, feature_pipeline, data_pipeline
 from openfold.model.model import AlphaFold
+from openfold.model.quantization import quantize_msa_transitions_
 from openfold.model.torchscript import script_preset_
 from openfold.np import residue_constants, protein
 import openfold.np.relax.relax as relax
@@ -260,6 +261,9 @@ def load_models_from_command_line(args, config):
         model.load_state_dict(sd)
 
     
+    if(args.quantize_msa_transitions):
+        quantize_msa_transitions_(model)
+
     model = model.to(args.model_device)
     logger.info(
         f"Loaded OpenFold parameters at {args.checkpoint_path}..."
@@ -452,6 +456,12 @@ if __name__ == "__main__":
              device name is accepted (e.g. "cpu", "cuda:0")"""
     )
     
+    parser.add_argument(
+        "--quantize_msa_transitions", action="store_true", default=False,
+        help="""Whether to run the MSA transitions with int8 dynamically
+             quantized weights. Only supported with --model_device cpu"""
+    )
+    
     parser.add_argument(
         "--use_precomputed_alignments", type=str, default=None,
         help="""Path to alignment directory. If provided, alignment computation 
@@ -506,4 +516,9 @@ if __name__ == "__main__":
             --model_device for better performance"""
         )
 
+    if(args.quantize_msa_transitions and args.model_device != "cpu"):
+        raise ValueError(
+            "--quantize_msa_transitions requires --model_device cpu"
+        )
+
     main(args)